@@ -0,0 +1,247 @@
+"""analysis-server 부하/성능 측정 도구.
+
+합성 데이터(수업, 제출 기록, 수업 시리즈별 학생 프로필 기록)를 원하는 규모로 만든 뒤
+주요 엔드포인트를 반복 호출해 엔드포인트별 처리량과 p50/p99 지연 시간을 보고한다.
+같은 --seed 로 돌리면 같은 데이터와 같은 요청 순서가 만들어지므로 저장 방식 변경 전후를 비교할 수 있다.
+
+    python benchmark.py --submissions 100000 --students 1000 --history-days 200
+    python benchmark.py --gunicorn 4 --scenarios submit-concurrent --concurrency 16
+    python benchmark.py --data-dir /tmp/bench --skip-generate --url http://127.0.0.1:8000
+
+--url/--gunicorn 이 없으면 Flask 테스트 클라이언트로 같은 프로세스 안에서 호출한다.
+--url 을 쓸 때는 서버의 DATA_DIR 과 API_KEY 가 이 도구의 --data-dir, API_KEY 와 같아야 한다.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+SCENARIOS = ('submit', 'submit-concurrent', 'pending', 'calendar', 'by-date-form', 'backup')
+ADMIN_PASSWORD = "dusrntlf"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="analysis-server 부하/성능 측정")
+    parser.add_argument('--data-dir', help="데이터 디렉토리 (기본: 임시 디렉토리)")
+    parser.add_argument('--skip-generate', action='store_true', help="이미 만들어 둔 데이터로 측정만 함")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--submissions', type=int, default=10000, help="제출 기록 수")
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--series', type=int, default=10, help="수업 시리즈 수")
+    parser.add_argument('--forms-per-series', type=int, default=5)
+    parser.add_argument('--days', type=int, default=365, help="제출 기록이 퍼져 있는 기간(일)")
+    parser.add_argument('--history-days', type=int, default=30, help="학생별 날짜별 프로필 기록 수")
+    parser.add_argument('--pending-ratio', type=float, default=0.01, help="대기(pending) 상태로 둘 제출 비율")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="쉼표로 구분, 가능한 값: " + ', '.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help="시나리오별 요청 수")
+    parser.add_argument('--backup-requests', type=int, default=3, help="backup 시나리오 요청 수")
+    parser.add_argument('--concurrency', type=int, default=8, help="submit-concurrent 동시 요청 수")
+    parser.add_argument('--url', help="이미 떠 있는 서버 주소")
+    parser.add_argument('--gunicorn', type=int, metavar='WORKERS', help="이 워커 수로 gunicorn 을 띄워 측정")
+    parser.add_argument('--json', metavar='PATH', help="결과를 JSON 으로도 저장")
+    return parser.parse_args()
+
+# --- 합성 데이터 ---
+def build_catalog(args):
+    # 수업 시리즈, 수업, 학생 목록. 같은 seed 면 항상 같은 결과
+    rng = random.Random(args.seed)
+    today = datetime.now().date(); first_day = today - timedelta(days=args.days)
+    series = [{"course_series": f"시리즈_{i:03d}", "subject": rng.choice(["수학", "과학", "물리", "화학"])} for i in range(args.series)]
+    forms = [{"id": f"form_{i:03d}_{j:02d}", "name": s["course_series"], "course_series": s["course_series"], "subject": s["subject"],
+              "startNumber": 1, "endNumber": 20, "startDate": first_day.isoformat(), "endDate": (today + timedelta(days=30)).isoformat()}
+             for i, s in enumerate(series) for j in range(args.forms_per_series)]
+    students = [{"student_name": f"학생{n:05d}", "phone_suffix": f"{n % 10000:04d}", "series": series[n % len(series)]} for n in range(args.students)]
+    return series, forms, students
+
+def make_submission(rng, forms_by_series, student, submitted_at):
+    form = rng.choice(forms_by_series[student["series"]["course_series"]])
+    return {"form_id": form["id"], "student_name": student["student_name"], "phone_suffix": student["phone_suffix"],
+            "subject": form["subject"], "course_series": form["course_series"], "submitted_at": submitted_at,
+            "answers": {str(q): rng.randint(1, 5) for q in range(1, 21)}}
+
+def generate(server, args, series, forms, students):
+    rng = random.Random(args.seed + 1)
+    forms_by_series = defaultdict(list)
+    for form in forms: forms_by_series[form["course_series"]].append(form)
+    now = datetime.now(server.KST); started = time.perf_counter()
+    server.init_all_dbs()
+    for path in (server.DB_JOURNAL_FILE, server.STUDENT_REGISTRY_DB):
+        if os.path.exists(path): os.remove(path)
+    server.atomic_write_json(server.FORMS_DB_FILE, forms)
+    # 제출 시각 순으로 id를 붙이고, 가장 최근 것 일부만 대기 상태로 둠
+    times = sorted(now - timedelta(days=args.days) + timedelta(seconds=rng.uniform(0, args.days * 86400)) for _ in range(args.submissions))
+    pending_from = len(times) - int(len(times) * args.pending_ratio)
+    submissions = []
+    for i, t in enumerate(times):
+        item = make_submission(rng, forms_by_series, rng.choice(students), t.isoformat())
+        item["id"] = i + 1; item["status"] = 'pending' if i >= pending_from else 'processed'
+        submissions.append(item)
+    server.atomic_write_json(server.DB_FILE, submissions)
+    print(f"제출 기록 {len(submissions)}건 생성 ({time.perf_counter() - started:.1f}s)")
+    started = time.perf_counter()
+    days = [(now - timedelta(days=d)).strftime('%Y%m%d') for d in range(args.history_days, 0, -1)]
+    by_series = defaultdict(list)
+    for student in students: by_series[(student["series"]["subject"], student["series"]["course_series"])].append(student)
+    for (subject, course_series), members in by_series.items():
+        with server.SeriesProfileStore(subject, course_series) as store:
+            for student in members:
+                student_id = f"{student['student_name']}({student['phone_suffix']})_{subject}"
+                profile = {comp: 50.0 for comp in server.COMPETENCIES}
+                for day in days:
+                    store.set_history(student_id, day, profile)
+                    profile = {comp: round(min(100.0, max(0.0, score + rng.uniform(-3, 3))), 2) for comp, score in profile.items()}
+                store.set_main(student_id, profile)
+    print(f"프로필 기록 {len(students)}명 x {len(days)}일 생성 ({time.perf_counter() - started:.1f}s)")
+
+# --- 클라이언트 ---
+class InProcessClient:
+    # Flask 테스트 클라이언트. 스레드마다 하나씩 만들어 씀
+    def __init__(self, server, api_key):
+        self.client = server.app.test_client(); self.api_key = api_key
+        self.client.post('/api/login', json={"password": ADMIN_PASSWORD})
+
+    def request(self, method, path, json_body=None, api_key=False):
+        headers = {'X-API-KEY': self.api_key} if api_key else {}
+        response = self.client.open(path, method=method, json=json_body, headers=headers, buffered=False)
+        chunks = []; size = 0
+        for chunk in response.response:
+            size += len(chunk)
+            if response.is_json: chunks.append(chunk)
+        response.close()
+        return response.status_code, size, json.loads(b''.join(chunks)) if response.is_json and chunks else None
+
+class HttpClient:
+    def __init__(self, base_url, api_key):
+        import requests
+        self.session = requests.Session(); self.base_url = base_url.rstrip('/'); self.api_key = api_key
+        self.session.post(self.base_url + '/api/login', json={"password": ADMIN_PASSWORD})
+
+    def request(self, method, path, json_body=None, api_key=False):
+        headers = {'X-API-KEY': self.api_key} if api_key else {}
+        with self.session.request(method, self.base_url + path, json=json_body, headers=headers, stream=True) as response:
+            is_json = response.headers.get('Content-Type', '').startswith('application/json'); chunks = []; size = 0
+            for chunk in response.iter_content(1024 * 1024):
+                size += len(chunk)
+                if is_json: chunks.append(chunk)
+            return response.status_code, size, json.loads(b''.join(chunks)) if is_json and chunks else None
+
+def start_gunicorn(workers, data_dir):
+    # 빈 포트에 gunicorn 을 띄우고 응답할 때까지 기다림
+    with socket.socket() as s: s.bind(('127.0.0.1', 0)); port = s.getsockname()[1]
+    env = dict(os.environ, DATA_DIR=data_dir)
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', str(workers), '-k', 'gthread', '--threads', '4', '-b', f'127.0.0.1:{port}', 'server:app'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1): return proc, f"http://127.0.0.1:{port}"
+        except OSError: time.sleep(0.2)
+    proc.kill(); raise RuntimeError("gunicorn 이 시작되지 않았습니다.")
+
+# --- 시나리오 ---
+def submit_body(rng, forms_by_series, students):
+    item = make_submission(rng, forms_by_series, rng.choice(students), None)
+    del item["submitted_at"], item["course_series"]
+    return item
+
+def build_requests(name, args, rng, forms, students, submissions_index):
+    # 시나리오 하나의 요청 목록 [(method, path, json_body, api_key)]
+    forms_by_series = defaultdict(list)
+    for form in forms: forms_by_series[form["course_series"]].append(form)
+    today = datetime.now().date()
+    if name in ('submit', 'submit-concurrent'):
+        return [('POST', '/submit', submit_body(rng, forms_by_series, students), False) for _ in range(args.requests)]
+    if name == 'pending':
+        return [('GET', '/pending-data?limit=500', None, True) for _ in range(args.requests)]
+    if name == 'calendar':
+        reqs = []
+        for _ in range(args.requests):
+            start = today - timedelta(days=rng.randint(0, max(args.days - 35, 0)))
+            reqs.append(('GET', f'/api/calendar/events?start={start.isoformat()}&end={(start + timedelta(days=35)).isoformat()}', None, False))
+        return reqs
+    if name == 'by-date-form':
+        return [('GET', '/api/data/by-date-form/{}/{}'.format(*rng.choice(submissions_index)), None, False) for _ in range(args.requests)]
+    if name == 'backup':
+        return [('GET', '/api/backup/download', None, False) for _ in range(args.backup_requests)]
+    raise ValueError(f"알 수 없는 시나리오: {name}")
+
+def percentile(sorted_values, p):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))]
+
+def run_scenario(name, reqs, make_client, concurrency):
+    latencies = []; errors = 0; total_bytes = 0; results = []; lock = threading.Lock()
+    local = threading.local()
+    def call(req):
+        nonlocal errors, total_bytes
+        if not hasattr(local, 'client'): local.client = make_client()
+        method, path, body, api_key = req
+        started = time.perf_counter(); status, size, response_body = local.client.request(method, path, body, api_key)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed); total_bytes += size; results.append((req, status, response_body))
+            if status >= 400: errors += 1
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool: list(pool.map(call, reqs))
+    else:
+        for req in reqs: call(req)
+    wall = time.perf_counter() - started; latencies.sort()
+    report = {"scenario": name, "requests": len(reqs), "errors": errors, "concurrency": concurrency, "seconds": round(wall, 3),
+              "throughput_rps": round(len(reqs) / wall, 1) if wall else 0.0, "bytes": total_bytes,
+              "p50_ms": round(percentile(latencies, 50) * 1000, 2), "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+              "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0}
+    return report, results
+
+def check_concurrent_submits(results):
+    # 같은 날 같은 (학생, 수업) 제출은 같은 id, 다른 제출끼리는 다른 id 여야 함
+    ids_by_key = defaultdict(set); keys_by_id = defaultdict(set)
+    for (_, _, body, _), status, response_body in results:
+        if status != 201 or not response_body: continue
+        key = (body["student_name"], body["phone_suffix"], body["form_id"])
+        ids_by_key[key].add(response_body["id"]); keys_by_id[response_body["id"]].add(key)
+    return sum(len(ids) > 1 for ids in ids_by_key.values()) + sum(len(keys) > 1 for keys in keys_by_id.values())
+
+def main():
+    args = parse_args()
+    data_dir = os.path.abspath(args.data_dir or tempfile.mkdtemp(prefix='analysis-bench-'))
+    os.environ['DATA_DIR'] = data_dir; os.environ.setdefault('API_KEY', 'benchmark-api-key')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import server
+    series, forms, students = build_catalog(args)
+    print(f"데이터 디렉토리: {data_dir}")
+    if not args.skip_generate: generate(server, args, series, forms, students)
+    submissions_index = sorted({(server.submission_kst_date(item), item.get('form_id')) for item in server.submission_store.all()} - {(None, None)})
+    if not submissions_index: submissions_index = [(datetime.now().date().isoformat(), forms[0]["id"])]
+    proc = None; base_url = args.url
+    if args.gunicorn: proc, base_url = start_gunicorn(args.gunicorn, data_dir)
+    api_key = os.environ['API_KEY']
+    make_client = (lambda: HttpClient(base_url, api_key)) if base_url else (lambda: InProcessClient(server, api_key))
+    reports = []
+    try:
+        for name in [n.strip() for n in args.scenarios.split(',') if n.strip()]:
+            rng = random.Random(f"{args.seed}:{name}")
+            reqs = build_requests(name, args, rng, forms, students, submissions_index)
+            report, results = run_scenario(name, reqs, make_client, args.concurrency if name == 'submit-concurrent' else 1)
+            if name == 'submit-concurrent': report["id_conflicts"] = check_concurrent_submits(results)
+            reports.append(report)
+            print(f"{name:<18} {report['requests']:>6}건  오류 {report['errors']:>4}  {report['throughput_rps']:>9.1f} req/s  "
+                  f"p50 {report['p50_ms']:>9.2f}ms  p99 {report['p99_ms']:>9.2f}ms  max {report['max_ms']:>9.2f}ms"
+                  + (f"  id 충돌 {report['id_conflicts']}" if 'id_conflicts' in report else ""))
+    finally:
+        if proc: proc.terminate(); proc.wait()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"args": vars(args), "data_dir": data_dir, "results": reports}, f, ensure_ascii=False, indent=2)
+    return 1 if any(r["errors"] or r.get("id_conflicts") for r in reports) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,9 @@
 # --- 필요한 라이브러리 불러오기 ---
-from flask import Flask, request, jsonify, render_template, session, make_response, send_file
+from flask import Flask, request, jsonify, render_template, session, make_response, Response, g, has_request_context
 from flask_session import Session
 import json
 import os
 import re
-import glob
 from datetime import datetime, timedelta
 from collections import defaultdict
 import pytz
@@ -12,25 +11,55 @@ import io
 import zipfile
 import shutil
 import pickle
-from itertools import groupby
+import sqlite3
+import hashlib
+import base64
+import threading
+import bisect
+import fcntl
+import socket
+import time
+import math
+import tempfile
+import pathlib
+import random
+import cProfile
+from contextlib import contextmanager
 
 # --- Flask 앱 초기화 및 설정 ---
 app = Flask(__name__, template_folder='.')
 app.config["SECRET_KEY"] = os.getenv("SESSION_KEY", "a_super_secret_key_for_session_management_!@#$")
 app.config["SESSION_TYPE"] = "filesystem"
-app.config["SESSION_FILE_DIR"] = "/var/data/sessions"
+app.config["SESSION_FILE_DIR"] = os.path.join(os.getenv("DATA_DIR", "/var/data"), "sessions")
 Session(app)
 
 # --- 경로 및 상수 설정 ---
-DATA_DIR = "/var/data"
+DATA_DIR = os.getenv("DATA_DIR", "/var/data")  # 벤치마크 등에서 다른 위치를 쓰려면 환경 변수로 지정
 STUDENT_DB_DIRECTORY = os.path.join(DATA_DIR, "students")
 DB_FILE = os.path.join(DATA_DIR, "submissions.json")
+DB_JOURNAL_FILE = os.path.join(DATA_DIR, "submissions.jsonl")
 FORMS_DB_FILE = os.path.join(DATA_DIR, "forms.json")
+SUBMISSIONS_LOCK_FILE = os.path.join(DATA_DIR, "submissions.lock")
+FORMS_LOCK_FILE = os.path.join(DATA_DIR, "forms.lock")
+NOTIFY_DIR = os.path.join(DATA_DIR, "notify")  # 워커별 알림 소켓
+STUDENT_REGISTRY_DB = os.path.join(DATA_DIR, "student_registry.db")  # 학생 목록 색인 (백업 대상 아님, 언제든 다시 만들 수 있음)
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")  # 워커별 계측값 스냅샷
+PROFILE_DUMP_DIR = os.path.join(DATA_DIR, "perf")  # 표본 프로파일(.prof) 저장 위치
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0보다 크면 그 비율의 요청을 cProfile로 기록
 API_SECRET_KEY = os.getenv("API_KEY")
 if not API_SECRET_KEY:
     raise ValueError("필수 환경 변수가 설정되지 않았습니다: API_KEY")
 ADMIN_PASSWORD = "dusrntlf"
 KST = pytz.timezone('Asia/Seoul')
+PROFILE_DB_NAME = "profiles.db"  # 수업 시리즈 디렉토리마다 하나씩 두는 학생 프로필 저장소
+COMPETENCIES = ('통찰력', '계산력', '논리력', '융합력', '개념', '전략')
+JOURNAL_COMPACT_THRESHOLD = 1000  # 저널이 이 줄 수를 넘으면 스냅샷(submissions.json)으로 압축
+BACKUP_CHUNK_SIZE = 1024 * 1024
+PENDING_WAIT_MAX = 60  # /pending-data?wait= 최대 대기 초
+BACKUP_MANIFEST_NAME = "backup_manifest.json"  # 백업 ZIP 안의 파일 목록(크기, 수정 시각, sha256). 증분 백업의 기준
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RECORD_COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+BACKUP_DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
 
 def init_all_dbs():
     paths_to_create = [DATA_DIR, app.config["SESSION_FILE_DIR"]]
@@ -40,13 +69,467 @@ def init_all_dbs():
         if not os.path.exists(db_path):
             with open(db_path, 'w', encoding='utf-8') as f: json.dump([], f, ensure_ascii=False, indent=2)
 
+# --- 성능 계측 ---
+class Metrics:
+    """프로세스별 카운터와 히스토그램. 요청이 끝날 때 최대 1초에 한 번 METRICS_DIR/<pid>-<시작 시각>.json 으로 내보내고,
+    /api/metrics 는 지금 살아 있는 워커의 파일만 합쳐 Prometheus 텍스트 형식으로 돌려준다. 종료된 워커의 파일은 이때 지우므로
+    워커가 재시작되면 합계가 줄어드는데, Prometheus는 이를 카운터 리셋으로 보고 rate() 등에서 처리한다.
+    파일 이름에 프로세스 시작 시각을 붙여, pid가 재사용돼도 예전 프로세스의 파일과 섞이지 않는다."""
+    def __init__(self, directory):
+        self.directory = directory; self._lock = threading.Lock(); self._flush_lock = threading.Lock()
+        self._counters = defaultdict(float); self._histograms = {}; self._last_flush = 0.0
+
+    @staticmethod
+    def _key(name, labels): return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+    @staticmethod
+    def _process_start(pid):
+        # /proc/<pid>/stat 의 starttime(부팅 후 클록 틱). 프로세스가 없으면 None
+        try:
+            with open(f"/proc/{pid}/stat", 'rb') as f: return f.read().rsplit(b')', 1)[1].split()[19].decode('ascii')
+        except (OSError, IndexError): return None
+
+    def _file_name(self):
+        pid = os.getpid()
+        return f"{pid}-{self._process_start(pid) or 0}.json"
+
+    def inc(self, name, value=1, **labels):
+        with self._lock: self._counters[self._key(name, labels)] += value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None: hist = self._histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(hist["buckets"]):
+                if value <= bound: hist["counts"][i] += 1
+            hist["sum"] += value; hist["count"] += 1
+
+    def scanned(self, count):
+        # 이번 요청에서 훑은 기록 수 (요청이 끝날 때 히스토그램에 반영)
+        if has_request_context(): g.records_scanned = g.get('records_scanned', 0) + count
+
+    def flush(self, force=False):
+        # 같은 워커의 여러 스레드가 동시에 내보내지 않도록 확인과 쓰기를 모두 _flush_lock 안에서 함
+        with self._flush_lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < 1: return
+            self._last_flush = now
+            with self._lock: snapshot = {"counters": dict(self._counters), "histograms": json.loads(json.dumps(self._histograms))}
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = os.path.join(self.directory, f"{self._file_name()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(self.directory, self._file_name()))
+
+    def render(self):
+        self.flush(force=True)
+        counters = defaultdict(float); histograms = {}
+        for name in os.listdir(self.directory):
+            pid, _, start = name.split('.', 1)[0].partition('-')
+            if not pid.isdigit() or self._process_start(pid) != start:  # 종료된 워커(또는 pid가 재사용된 예전 워커)의 파일
+                try: os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError: pass
+                continue
+            if not name.endswith('.json'): continue
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f: snapshot = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError): continue
+            for key, value in snapshot["counters"].items(): counters[key] += value
+            for key, hist in snapshot["histograms"].items():
+                merged = histograms.setdefault(key, {"buckets": hist["buckets"], "counts": [0] * len(hist["buckets"]), "sum": 0.0, "count": 0})
+                merged["counts"] = [a + b for a, b in zip(merged["counts"], hist["counts"])]; merged["sum"] += hist["sum"]; merged["count"] += hist["count"]
+        def fmt_labels(labels, extra=()):
+            items = [(k, v) for k, v in labels] + list(extra)
+            if not items: return ""
+            escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+        lines = []; typed = set()
+        for key in sorted(counters):
+            name, labels = json.loads(key)
+            if name not in typed: lines.append(f"# TYPE {name} counter"); typed.add(name)
+            lines.append(f"{name}{fmt_labels(labels)} {counters[key]:g}")
+        for key in sorted(histograms):
+            name, labels = json.loads(key); hist = histograms[key]
+            if name not in typed: lines.append(f"# TYPE {name} histogram"); typed.add(name)
+            for bound, count in zip(hist["buckets"], hist["counts"]): lines.append(f"{name}_bucket{fmt_labels(labels, [('le', f'{bound:g}')])} {count}")
+            lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{name}_sum{fmt_labels(labels)} {hist['sum']:g}"); lines.append(f"{name}_count{fmt_labels(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics(METRICS_DIR)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter(); g.records_scanned = 0
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        profiler = cProfile.Profile()
+        try: profiler.enable(); g.profiler = profiler
+        except ValueError: pass  # 다른 스레드에서 이미 프로파일링 중
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'request_started' not in g: return
+    endpoint = request.endpoint or 'unknown'
+    metrics.observe('analysis_request_duration_seconds', time.perf_counter() - g.request_started, endpoint=endpoint, method=request.method)
+    metrics.observe('analysis_request_records_scanned', g.records_scanned, buckets=RECORD_COUNT_BUCKETS, endpoint=endpoint)
+    metrics.inc('analysis_records_scanned_total', g.records_scanned, endpoint=endpoint)
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.disable(); os.makedirs(PROFILE_DUMP_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DUMP_DIR, f"{endpoint}_{datetime.now(KST).strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{threading.get_ident()}.prof"))
+    try: metrics.flush()
+    except OSError: pass
+
 # --- 헬퍼 함수 ---
-def get_student_paths(subject, course_series, student_id):
-    s_id_safe = student_id.replace('/', '_')
+def get_series_paths(subject, course_series):
     series_dir = os.path.join(STUDENT_DB_DIRECTORY, subject, course_series)
-    backup_dir = os.path.join(series_dir, "backups")
-    main_profile_path = os.path.join(series_dir, f"{s_id_safe}.pkl")
-    return series_dir, backup_dir, main_profile_path
+    return series_dir, os.path.join(series_dir, "backups")
+
+def safe_student_id(student_id): return student_id.replace('/', '_')
+
+def group_by_series(entries):
+    # [{student_id, subject, course_series, ...}] -> {(subject, course_series): [entry, ...]} (입력 순서 유지)
+    groups = defaultdict(list)
+    for entry in entries: groups[(entry.get('subject'), entry.get('course_series'))].append(entry)
+    return groups
+
+def atomic_write_json(path, data):
+    # 같은 디렉토리의 임시 파일에 쓴 뒤 교체하여, 쓰는 도중에 파일이 깨진 상태로 남지 않도록 함
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2); f.flush(); os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+@contextmanager
+def file_lock(lock_path, exclusive=True):
+    # gunicorn 워커(프로세스) 간 직렬화를 위한 flock 잠금
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        wait_started = time.perf_counter()
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        metrics.observe('analysis_lock_wait_seconds', time.perf_counter() - wait_started, lock=os.path.splitext(os.path.basename(lock_path))[0], mode='exclusive' if exclusive else 'shared')
+        try: yield
+        finally: fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# --- 제출 기록 저장소 ---
+def submission_kst_date(item):
+    try: return datetime.fromisoformat(item.get('submitted_at')).astimezone(KST).strftime('%Y-%m-%d')
+    except (ValueError, TypeError): return None
+
+def submission_student_id(item):
+    if not all(k in item for k in ['student_name', 'phone_suffix', 'subject']): return None
+    return f"{item['student_name']}({item['phone_suffix']})_{item['subject']}"
+
+def same_day_key(date_str, item):
+    return (date_str, item.get('student_name'), item.get('phone_suffix'), item.get('form_id'))
+
+class SubmissionStore:
+    """submissions.json 스냅샷 + 추가 전용 저널(JSON Lines). 모든 기록은 메모리에 id 기준으로 색인된다.
+    변경된 기록만 저널 끝에 한 줄씩 추가하고, 저널이 길어지면 스냅샷으로 압축한다.
+    여러 gunicorn 워커가 같은 파일을 쓰므로, 모든 접근은 파일 잠금 안에서 디스크와 동기화한 뒤 이루어진다.
+    기록이 색인에 들어갈 때 KST 제출 날짜를 한 번만 계산해 두고, (날짜, 이름, 전화 뒷자리, form_id) 색인과
+    날짜 -> form_id -> 제출 id 색인(달력/날짜별 조회용, 날짜는 정렬된 목록으로 범위 검색)과
+    (submitted_at, id) 순으로 정렬된 처리 대기(pending) 큐도 함께 갱신한다."""
+    def __init__(self, snapshot_path, journal_path, lock_path, compact_threshold=JOURNAL_COMPACT_THRESHOLD):
+        self.snapshot_path = snapshot_path; self.journal_path = journal_path; self.lock_path = lock_path; self.compact_threshold = compact_threshold
+        self._lock = threading.RLock(); self._lock_depth = 0
+        self._by_id = None; self._max_id = 0; self._journal_lines = 0
+        self._kst_dates = {}; self._by_day_key = {}; self._by_date = {}; self._sorted_dates = []
+        self._pending_keys = []; self._pending_key_of = {}
+        self._snapshot_sig = None; self._journal_ino = None; self._journal_offset = 0
+
+    @contextmanager
+    def _locked(self, exclusive=False):
+        with self._lock:
+            if self._lock_depth:  # transaction() 안에서 호출된 경우 이미 잡힌 잠금을 그대로 사용
+                yield; return
+            with file_lock(self.lock_path, exclusive):
+                self._lock_depth += 1
+                try: self._sync(); yield
+                finally: self._lock_depth -= 1
+
+    def transaction(self):
+        # 조회-수정-기록 전체를 다른 워커와 직렬화 (중복 검사, ID 발급 등)
+        return self._locked(exclusive=True)
+
+    def _stat_files(self):
+        try: st = os.stat(self.snapshot_path); snapshot_sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError: snapshot_sig = None
+        try: st = os.stat(self.journal_path); journal_ino, journal_size = st.st_ino, st.st_size
+        except FileNotFoundError: journal_ino, journal_size = None, 0
+        return snapshot_sig, journal_ino, journal_size
+
+    def _set(self, item):
+        s_id = item['id']; old = self._by_id.get(s_id)
+        if old is not None: self._unindex(s_id, old)
+        self._by_id[s_id] = item; self._max_id = max(self._max_id, s_id)
+        if item.get('status') == 'pending':
+            pending_key = self._pending_key_of[s_id] = (str(item.get('submitted_at') or ''), s_id)
+            bisect.insort(self._pending_keys, pending_key)
+        date_str = self._kst_dates[s_id] = submission_kst_date(item)
+        if not date_str: return
+        try:
+            self._by_day_key.setdefault(same_day_key(date_str, item), set()).add(s_id)
+            if date_str not in self._by_date: bisect.insort(self._sorted_dates, date_str)
+            self._by_date.setdefault(date_str, {}).setdefault(item.get('form_id'), set()).add(s_id)
+        except TypeError: pass  # 해시할 수 없는 값(form_id 등)이 들어온 기록은 보조 색인에서 제외
+
+    def _unindex(self, s_id, old):
+        pending_key = self._pending_key_of.pop(s_id, None)
+        if pending_key: self._pending_keys.pop(bisect.bisect_left(self._pending_keys, pending_key))
+        date_str = self._kst_dates.get(s_id)
+        if not date_str: return
+        try:
+            old_key = same_day_key(date_str, old); ids = self._by_day_key.get(old_key)
+            if ids is not None:
+                ids.discard(s_id)
+                if not ids: del self._by_day_key[old_key]
+            forms = self._by_date.get(date_str, {}); ids = forms.get(old.get('form_id'))
+            if ids is not None:
+                ids.discard(s_id)
+                if not ids: del forms[old.get('form_id')]
+            if not forms and date_str in self._by_date:
+                del self._by_date[date_str]; self._sorted_dates.pop(bisect.bisect_left(self._sorted_dates, date_str))
+        except TypeError: pass
+
+    def _sync(self):
+        # 다른 워커가 압축(파일 교체)했으면 전부 다시 읽고, 저널만 늘었으면 늘어난 부분만 반영
+        snapshot_sig, journal_ino, journal_size = self._stat_files()
+        if self._by_id is None or snapshot_sig != self._snapshot_sig or journal_ino != self._journal_ino or journal_size < self._journal_offset:
+            self._by_id = {}; self._max_id = 0; self._journal_lines = 0
+            self._kst_dates = {}; self._by_day_key = {}; self._by_date = {}; self._sorted_dates = []
+            self._pending_keys = []; self._pending_key_of = {}
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    for item in json.load(f): self._set(item)
+                metrics.inc('analysis_storage_bytes_read_total', snapshot_sig[2], store='submissions')
+            except (FileNotFoundError, json.JSONDecodeError): pass
+            self._snapshot_sig = snapshot_sig; self._journal_ino = journal_ino; self._journal_offset = 0
+        if journal_size > self._journal_offset: self._replay_journal()
+
+    def _replay_journal(self):
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset); metrics.inc('analysis_storage_bytes_read_total', os.fstat(f.fileno()).st_size - self._journal_offset, store='submissions')
+                for line in f:
+                    if not line.endswith(b'\n'): break  # 아직 기록 중이거나 끊긴 마지막 줄
+                    self._journal_offset += len(line)
+                    try: item = json.loads(line)
+                    except json.JSONDecodeError: continue
+                    self._set(item); self._journal_lines += 1
+        except FileNotFoundError: pass
+
+    def all(self):
+        with self._locked(): metrics.scanned(len(self._by_id)); return list(self._by_id.values())
+
+    def get(self, submission_id):
+        with self._locked(): return self._by_id.get(submission_id)
+
+    def find_same_day(self, date_str, student_name, phone_suffix, form_id):
+        with self._locked():
+            # 같은 키의 기록이 여럿이면 예전처럼 가장 앞선(작은 id) 기록을 사용
+            try: ids = self._by_day_key.get((date_str, student_name, phone_suffix, form_id))
+            except TypeError: return None
+            return self._by_id[min(ids)] if ids else None
+
+    def forms_by_date(self, start_str, end_str):
+        # start_str <= 날짜 < end_str 인 날짜별 form_id 목록. 전체 기록이 아닌 결과 크기에 비례하는 비용
+        with self._locked():
+            lo = bisect.bisect_left(self._sorted_dates, start_str); hi = bisect.bisect_left(self._sorted_dates, end_str)
+            return [(d, list(self._by_date[d])) for d in self._sorted_dates[lo:hi]]
+
+    def since_date(self, start_date_str):
+        # KST 날짜가 start_date_str 이후인 기록 (날짜 색인 범위 조회)
+        with self._locked():
+            lo = bisect.bisect_left(self._sorted_dates, start_date_str)
+            items = [self._by_id[s_id] for d in self._sorted_dates[lo:] for ids in self._by_date[d].values() for s_id in ids]
+            metrics.scanned(len(items)); return items
+
+    def on_date_form(self, date_str, form_id):
+        with self._locked():
+            items = [self._by_id[s_id] for s_id in sorted(self._by_date.get(date_str, {}).get(form_id, ()))]
+            metrics.scanned(len(items)); return items
+
+    def version(self):
+        # 디스크 상태(스냅샷 서명, 저널 inode와 길이)로 만든 버전. 모든 워커에서 같은 값이므로 ETag로 사용
+        with self._locked(): return "-".join(map(str, (*(self._snapshot_sig or ()), self._journal_ino, self._journal_offset)))
+
+    def pending_page(self, after_key=None, limit=None):
+        # (submitted_at, id) 순의 대기 기록 중 after_key 다음부터 limit개. 더 남아 있으면 마지막 키를 다음 커서로 돌려줌
+        with self._locked():
+            lo = bisect.bisect_right(self._pending_keys, after_key) if after_key else 0
+            hi = len(self._pending_keys) if limit is None else min(lo + limit, len(self._pending_keys))
+            keys = self._pending_keys[lo:hi]
+            next_key = keys[-1] if keys and hi < len(self._pending_keys) else None
+            metrics.scanned(len(keys))
+            return [self._by_id[s_id] for _, s_id in keys], next_key, self.version()
+
+    def next_id(self):
+        # 잠금 안에서 디스크와 동기화된 최댓값 기준이므로 워커 간에도 ID가 겹치지 않음 (transaction 안에서 호출)
+        with self._locked(exclusive=True): return self._max_id + 1
+
+    def put_many(self, items):
+        if not items: return
+        with self._locked(exclusive=True):
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            payload = ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in items).encode('utf-8')
+            with open(self.journal_path, 'ab') as f:
+                if f.tell() != self._journal_offset: payload = b'\n' + payload  # 끊긴 줄 뒤에 이어 쓰지 않도록 줄바꿈부터
+                f.write(payload); f.flush(); os.fsync(f.fileno())
+                metrics.inc('analysis_storage_bytes_written_total', len(payload), store='submissions')
+                self._journal_ino = os.fstat(f.fileno()).st_ino; self._journal_offset = f.tell()
+            for item in items: self._set(item)
+            self._journal_lines += len(items)
+            if self._journal_lines >= self.compact_threshold: self.compact()
+
+    def put(self, item): self.put_many([item])
+
+    def open_files(self):
+        # 잠금 안에서 스냅샷과 저널을 함께 열어 둠. 이후 압축으로 파일이 교체되어도 열린 두 파일은 서로 맞는 한 쌍
+        with self._locked():
+            return [(path, open(path, 'rb')) for path in (self.snapshot_path, self.journal_path) if os.path.exists(path)]
+
+    def compact(self):
+        with self._locked(exclusive=True):
+            # 스냅샷을 먼저 교체하고 저널을 빈 파일로 교체. 그 사이에 중단되어도 저널 재적용 결과는 동일함
+            atomic_write_json(self.snapshot_path, list(self._by_id.values()))
+            metrics.inc('analysis_storage_bytes_written_total', os.path.getsize(self.snapshot_path), store='submissions'); metrics.inc('analysis_journal_compactions_total')
+            tmp_path = f"{self.journal_path}.tmp{os.getpid()}"
+            with open(tmp_path, 'wb'): pass
+            os.replace(tmp_path, self.journal_path)
+            self._snapshot_sig, self._journal_ino, _ = self._stat_files()
+            self._journal_offset = 0; self._journal_lines = 0
+
+submission_store = SubmissionStore(DB_FILE, DB_JOURNAL_FILE, SUBMISSIONS_LOCK_FILE)
+
+# --- 수업(Form) 목록 캐시 ---
+class FormsCatalog:
+    """forms.json을 프로세스 안에 캐시한다. 파일의 inode/mtime이 바뀌면(다른 워커의 수정) 다시 읽고,
+    id별/이름별 묶음과 파싱된 수업 기간(시작일 내림차순)을 미리 만들어 둔다. 이 워커의 수정은 write()로 즉시 반영."""
+    def __init__(self, path):
+        self.path = path; self._lock = threading.RLock(); self._sig = False
+        self._forms = []; self._by_id = {}; self._by_name = {}; self._dated = []; self._active_cache = (None, [])
+
+    def _file_sig(self):
+        try: st = os.stat(self.path); return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError: return None
+
+    def _build(self, forms):
+        by_id = {}; by_name = {}; dated = []
+        for form in forms:
+            if 'id' in form: by_id.setdefault(form['id'], form)
+            by_name.setdefault(form.get('name'), []).append(form)
+            try:
+                start_date = datetime.strptime(form.get('startDate', '1970-01-01'), '%Y-%m-%d').date()
+                end_date = datetime.strptime(form.get('endDate', '2999-12-31'), '%Y-%m-%d').date()
+                dated.append((start_date, end_date, form))
+            except (ValueError, TypeError): continue
+        dated.sort(key=lambda x: x[2].get('startDate', ''), reverse=True)
+        self._forms = forms; self._by_id = by_id; self._by_name = by_name; self._dated = dated; self._active_cache = (None, [])
+
+    def _refresh(self):
+        sig = self._file_sig()
+        if sig == self._sig: return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: forms = json.load(f)
+            metrics.inc('analysis_storage_bytes_read_total', sig[2], store='forms')
+        except (FileNotFoundError, json.JSONDecodeError): forms = []
+        self._build(forms); self._sig = sig
+
+    def all(self):
+        with self._lock: self._refresh(); return list(self._forms)
+
+    def get(self, form_id):
+        with self._lock:
+            self._refresh()
+            try: return self._by_id.get(form_id)
+            except TypeError: return None
+
+    def by_name(self, name):
+        with self._lock: self._refresh(); return list(self._by_name.get(name, []))
+
+    def grouped(self):
+        with self._lock:
+            self._refresh()
+            return [{"name": name, "subject": group[0].get('subject'), "instance_count": len(group)} for name, group in sorted((n, g) for n, g in self._by_name.items() if n is not None)]
+
+    def active_on(self, day):
+        with self._lock:
+            self._refresh()
+            cached_day, active_forms = self._active_cache
+            if cached_day != day:
+                active_forms = [form for start_date, end_date, form in self._dated if start_date <= day <= end_date]
+                self._active_cache = (day, active_forms)
+            return active_forms
+
+    def write(self, forms):
+        # FORMS_LOCK_FILE 잠금 안에서 호출
+        with self._lock:
+            atomic_write_json(self.path, forms)
+            self._build(forms); self._sig = self._file_sig()
+            metrics.inc('analysis_storage_bytes_written_total', self._sig[2], store='forms')
+
+forms_catalog = FormsCatalog(FORMS_DB_FILE)
+
+# --- 워커 간 알림 ---
+class ChangeNotifier:
+    """제출 기록이 바뀌었음(새 대기 기록, 처리 완료 표시 등)을 모든 gunicorn 워커에 알린다. 워커마다 NOTIFY_DIR에 Unix 데이터그램 소켓을 하나 열어 두고,
+    notify()가 모든 소켓에 1바이트를 보내면 각 워커의 수신 스레드가 wait() 중인 요청을 깨운다."""
+    def __init__(self, directory):
+        self.directory = directory; self._cond = threading.Condition(); self._generation = 0
+        self._listener_pid = None; self._setup_lock = threading.Lock()
+
+    def _socket_path(self, pid): return os.path.join(self.directory, f"{pid}.sock")
+
+    def _ensure_listener(self):
+        # gunicorn은 fork 뒤에 워커를 만들므로, 현재 프로세스에서 처음 기다릴 때 소켓과 수신 스레드를 만듦
+        with self._setup_lock:
+            if self._listener_pid == os.getpid(): return
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._socket_path(os.getpid())
+            try: os.unlink(path)
+            except FileNotFoundError: pass
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM); sock.bind(path)
+            threading.Thread(target=self._listen, args=(sock,), daemon=True).start()
+            self._listener_pid = os.getpid()
+
+    def _listen(self, sock):
+        while True:
+            try: sock.recv(64)
+            except OSError: return
+            self._wake()
+
+    def _wake(self):
+        with self._cond: self._generation += 1; self._cond.notify_all()
+
+    def notify(self):
+        self._wake()
+        try: names = os.listdir(self.directory)
+        except FileNotFoundError: return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for name in names:
+                if not name.endswith('.sock') or name == f"{os.getpid()}.sock": continue
+                path = os.path.join(self.directory, name)
+                try: sender.sendto(b'1', path)
+                except (ConnectionRefusedError, FileNotFoundError):  # 종료된 워커의 소켓
+                    try: os.unlink(path)
+                    except FileNotFoundError: pass
+                except BlockingIOError: pass  # 수신 버퍼가 찼다면 이미 깨울 알림이 쌓여 있음
+
+    def wait(self, predicate, timeout):
+        # predicate()가 참이 되거나 timeout이 지날 때까지 대기. 알림을 놓쳐도 5초마다 다시 확인
+        self._ensure_listener()
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond: generation = self._generation
+            if predicate(): return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: return False
+            with self._cond:
+                if self._generation == generation: self._cond.wait(min(remaining, 5))
+
+pending_notifier = ChangeNotifier(NOTIFY_DIR)
 
 # --- 인증 관련 API ---
 def is_admin_session(): return session.get('is_admin', False)
@@ -75,31 +558,11 @@ def index():
 @app.route('/api/forms', methods=['GET'])
 def get_forms():
     is_active_filter = request.args.get('active', 'false').lower() == 'true'
-    all_forms = []
-    try:
-        with open(FORMS_DB_FILE, 'r', encoding='utf-8') as f: all_forms = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError): return jsonify([])
     if is_active_filter:
-        today = datetime.now(KST).date()
-        active_forms = []
-        for form in all_forms:
-            try:
-                start_date = datetime.strptime(form.get('startDate', '1970-01-01'), '%Y-%m-%d').date()
-                end_date = datetime.strptime(form.get('endDate', '2999-12-31'), '%Y-%m-%d').date()
-                if start_date <= today <= end_date:
-                    active_forms.append(form)
-            except (ValueError, TypeError): continue
-        return jsonify(sorted(active_forms, key=lambda x: x['startDate'], reverse=True))
+        return jsonify(forms_catalog.active_on(datetime.now(KST).date()))
     else:
         if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
-        grouped_forms = []
-        all_forms.sort(key=lambda x: x['name'])
-        for name, group in groupby(all_forms, key=lambda x: x['name']):
-            group_list = list(group)
-            if group_list:
-                first_item = group_list[0]
-                grouped_forms.append({ "name": name, "subject": first_item.get('subject'), "instance_count": len(group_list) })
-        return jsonify(sorted(grouped_forms, key=lambda x: x['name']))
+        return jsonify(forms_catalog.grouped())
 
 @app.route('/api/forms', methods=['POST'])
 def add_form():
@@ -109,11 +572,8 @@ def add_form():
         return jsonify({"error": "수업 데이터 형식이 올바르지 않습니다."}), 400
     series_name = new_form_data.get('name', 'default_series')
     new_form_data['course_series'] = re.sub(r'[\s\/:*?"<>|]', '_', series_name)
-    try:
-        with open(FORMS_DB_FILE, 'r', encoding='utf-8') as f: forms = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError): forms = []
-    forms.append(new_form_data)
-    with open(FORMS_DB_FILE, 'w', encoding='utf-8') as f: json.dump(forms, f, ensure_ascii=False, indent=2)
+    with file_lock(FORMS_LOCK_FILE):
+        forms_catalog.write(forms_catalog.all() + [new_form_data])
     return jsonify({"message": "새로운 수업이 성공적으로 개설되었습니다."}), 201
 
 @app.route('/api/forms/by-name', methods=['GET', 'DELETE'])
@@ -122,21 +582,18 @@ def handle_forms_by_name():
     if request.method == 'GET':
         name = request.args.get('name')
         if not name: return jsonify({"error": "수업 이름이 필요합니다."}), 400
-        try:
-            with open(FORMS_DB_FILE, 'r', encoding='utf-8') as f: forms = json.load(f)
-            instances = [f for f in forms if f.get('name') == name]
-            return jsonify(sorted(instances, key=lambda x: x['startDate'], reverse=True))
-        except (FileNotFoundError, json.JSONDecodeError):
-            return jsonify([])
+        instances = forms_catalog.by_name(name)
+        return jsonify(sorted(instances, key=lambda x: x.get('startDate', ''), reverse=True))
     if request.method == 'DELETE':
         name = request.json.get('name')
         if not name: return jsonify({"error": "수업 이름이 필요합니다."}), 400
         try:
-            with open(FORMS_DB_FILE, 'r', encoding='utf-8') as f: forms = json.load(f)
-            forms_after_delete = [f for f in forms if f.get('name') != name]
-            if len(forms) == len(forms_after_delete):
-                return jsonify({"error": "해당 이름의 수업 그룹을 찾을 수 없습니다."}), 404
-            with open(FORMS_DB_FILE, 'w', encoding='utf-8') as f: json.dump(forms_after_delete, f, ensure_ascii=False, indent=2)
+            with file_lock(FORMS_LOCK_FILE):
+                forms = forms_catalog.all()
+                forms_after_delete = [f for f in forms if f.get('name') != name]
+                if len(forms) == len(forms_after_delete):
+                    return jsonify({"error": "해당 이름의 수업 그룹을 찾을 수 없습니다."}), 404
+                forms_catalog.write(forms_after_delete)
             return jsonify({"message": f"'{name}' 수업 그룹이 성공적으로 삭제되었습니다."})
         # --- [버그 수정] ---
         # 누락되었던 except 블록 추가
@@ -148,11 +605,12 @@ def handle_forms_by_name():
 def delete_form_instance(form_id):
     if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
     try:
-        with open(FORMS_DB_FILE, 'r', encoding='utf-8') as f: forms = json.load(f)
-        forms_after_delete = [f for f in forms if f.get('id') != form_id]
-        if len(forms) == len(forms_after_delete):
-            return jsonify({"error": "해당 ID의 수업을 찾을 수 없습니다."}), 404
-        with open(FORMS_DB_FILE, 'w', encoding='utf-8') as f: json.dump(forms_after_delete, f, ensure_ascii=False, indent=2)
+        with file_lock(FORMS_LOCK_FILE):
+            forms = forms_catalog.all()
+            forms_after_delete = [f for f in forms if f.get('id') != form_id]
+            if len(forms) == len(forms_after_delete):
+                return jsonify({"error": "해당 ID의 수업을 찾을 수 없습니다."}), 404
+            forms_catalog.write(forms_after_delete)
         return jsonify({"message": "선택한 날짜의 수업이 성공적으로 삭제되었습니다."})
     except (FileNotFoundError, json.JSONDecodeError):
         return jsonify({"error": "수업 데이터를 찾을 수 없습니다."}), 404
@@ -162,105 +620,353 @@ def delete_form_instance(form_id):
 def submit_data():
     data = request.get_json()
     try:
-        with open(FORMS_DB_FILE, 'r', encoding='utf-8') as f: forms = json.load(f)
-        target_form = next((form for form in forms if form['id'] == data.get('form_id')), None)
+        target_form = forms_catalog.get(data.get('form_id'))
         data['course_series'] = target_form.get('course_series', 'default') if target_form else 'default'
     except:
         data['course_series'] = 'default'
-    db_data = []
-    try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError): pass
     now_kst = datetime.now(KST)
     today_kst_str = now_kst.strftime('%Y-%m-%d')
-    key_to_check = (today_kst_str, data.get('student_name'), data.get('phone_suffix'), data.get('form_id'))
-    found_and_updated = False
-    for i, item in enumerate(db_data):
-        try:
-            item_date_str = datetime.fromisoformat(item.get('submitted_at')).astimezone(KST).strftime('%Y-%m-%d')
-            if (item_date_str, item.get('student_name'), item.get('phone_suffix'), item.get('form_id')) == key_to_check:
-                data['id'] = item['id']; data['status'] = 'pending'; data['submitted_at'] = now_kst.isoformat()
-                db_data[i] = data; found_and_updated = True; break
-        except (ValueError, TypeError): continue
-    if not found_and_updated:
-        data['id'] = (db_data[-1]['id'] + 1) if db_data else 1; data['status'] = 'pending'; data['submitted_at'] = now_kst.isoformat(); db_data.append(data)
-    with open(DB_FILE, 'w', encoding='utf-8') as f: json.dump(db_data, f, ensure_ascii=False, indent=2)
+    with submission_store.transaction():
+        existing = submission_store.find_same_day(today_kst_str, data.get('student_name'), data.get('phone_suffix'), data.get('form_id'))
+        data['id'] = existing['id'] if existing else submission_store.next_id(); data['status'] = 'pending'; data['submitted_at'] = now_kst.isoformat()
+        submission_store.put(data)
+    pending_notifier.notify()
+    if submission_student_id(data): student_registry.register([(submission_student_id(data), data['subject'], data['course_series'])], has_submissions=True)
     return jsonify({"message": "데이터가 성공적으로 제출되었습니다.", "id": data['id']}), 201
 
 @app.route('/pending-data', methods=['GET'])
 def get_pending_data():
     if not is_admin_apikey(): return jsonify({"error": "권한이 없습니다."}), 401
-    try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data = json.load(f)
-    except: db_data = []
-    pending_list = [item for item in db_data if item.get('status') == 'pending']
-    pending_list.sort(key=lambda x: x.get('submitted_at', ''))
-    return jsonify(pending_list)
+    # ?limit=N 으로 나눠 받고, 응답의 X-Next-Cursor 값을 ?cursor= 로 넘기면 다음 페이지.
+    # 커서는 한 번의 처리 주기 안에서만 사용 (재계산으로 예전 제출이 다시 대기 상태가 될 수 있으므로 매 주기는 커서 없이 시작)
+    # 변경이 없으면 If-None-Match 에 대해 304 응답
+    # ?wait=초 : 새 대기 기록이 생길 때까지(If-None-Match가 있으면 그 버전에서 바뀔 때까지도) 최대 PENDING_WAIT_MAX초 기다렸다가 응답
+    after_key = None
+    if request.args.get('cursor'):
+        try: submitted_at, _, s_id = base64.urlsafe_b64decode(request.args['cursor']).decode('utf-8').rpartition('|')
+        except ValueError: s_id = ''  # binascii.Error, UnicodeDecodeError, ASCII가 아닌 문자
+        if not s_id.isdigit(): return jsonify({"error": "cursor 형식이 올바르지 않습니다."}), 400
+        after_key = (submitted_at, int(s_id))
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit <= 0: return jsonify({"error": "limit은 1 이상이어야 합니다."}), 400
+    wait_seconds = request.args.get('wait', 0, type=float)
+    if not math.isfinite(wait_seconds): return jsonify({"error": "wait은 유한한 숫자여야 합니다."}), 400  # nan이면 대기 루프가 끝나지 않음
+    wait_seconds = min(max(wait_seconds, 0), PENDING_WAIT_MAX)
+    if wait_seconds:
+        pending_notifier.wait(lambda: bool(submission_store.pending_page(after_key, 1)[0]) and not request.if_none_match.contains(submission_store.version()), wait_seconds)
+    current_version = submission_store.version()
+    if request.if_none_match.contains(current_version):
+        resp = Response(status=304); resp.set_etag(current_version); return resp
+    pending_list, next_key, version = submission_store.pending_page(after_key, limit)
+    resp = jsonify(pending_list); resp.set_etag(version)
+    if next_key: resp.headers['X-Next-Cursor'] = base64.urlsafe_b64encode(f"{next_key[0]}|{next_key[1]}".encode('utf-8')).decode('ascii')
+    return resp
 
 @app.route('/mark-processed', methods=['POST'])
 def mark_processed():
     if not is_admin_apikey(): return jsonify({"error": "권한이 없습니다."}), 401
     processed_ids = request.get_json().get('ids', []);
-    try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data = json.load(f)
-    except: db_data = []
     now_kst_iso = datetime.now(KST).isoformat()
-    for item in db_data:
-        if item.get('id') in processed_ids: item['status'] = 'processed'; item['processed_at'] = now_kst_iso
-    with open(DB_FILE, 'w', encoding='utf-8') as f: json.dump(db_data, f, ensure_ascii=False, indent=2)
+    with submission_store.transaction():
+        updated = []
+        for s_id in processed_ids:
+            item = submission_store.get(s_id)
+            if item: updated.append({**item, 'status': 'processed', 'processed_at': now_kst_iso})
+        submission_store.put_many(updated)
+    if updated: pending_notifier.notify()  # If-None-Match로 버전 변경을 기다리는 ?wait= 요청을 깨움
     return jsonify({"message": f"{len(processed_ids)}개 항목이 처리 완료로 표시되었습니다."})
 
-# --- 학생 데이터(.pkl) 관리 API ---
+# --- 학생 프로필 저장소 (수업 시리즈별 SQLite) ---
+PROFILE_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (student_id TEXT PRIMARY KEY, profile BLOB NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history (student_id TEXT NOT NULL, day TEXT NOT NULL, profile BLOB NOT NULL, PRIMARY KEY (student_id, day)) WITHOUT ROWID;
+"""
+
+class SeriesProfileStore:
+    """수업 시리즈 하나의 학생 프로필을 SQLite 파일(profiles.db) 하나에 보관한다.
+    profiles 테이블은 현재 프로필, history 테이블은 날짜(YYYYMMDD)별로 그날 처리 전 프로필(예전 backups/*.pkl)을 담는다.
+    with 블록 하나가 트랜잭션 하나. 예전 방식의 .pkl 파일이 남아 있으면 열 때 가져온 뒤 삭제한다."""
+    def __init__(self, subject, course_series):
+        self.series_dir, self.legacy_backup_dir = get_series_paths(subject, course_series)
+        self.db_path = os.path.join(self.series_dir, PROFILE_DB_NAME); self.conn = None
+
+    @staticmethod
+    def has_data(series_dir):
+        # profiles.db 또는 가져오지 않은 예전 .pkl 파일이 있는 디렉토리인지
+        try: return any(n == PROFILE_DB_NAME or n == "backups" or n.endswith('.pkl') for n in os.listdir(series_dir))
+        except (FileNotFoundError, NotADirectoryError): return False
+
+    def __enter__(self):
+        os.makedirs(self.series_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.executescript(PROFILE_DB_SCHEMA)
+        self._import_legacy_pickles()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            if exc_type is None: self.conn.commit()
+            else: self.conn.rollback()
+        finally: self.conn.close()
+
+    def _import_legacy_pickles(self):
+        mains = [n for n in os.listdir(self.series_dir) if n.endswith('.pkl')]
+        backups = os.listdir(self.legacy_backup_dir) if os.path.isdir(self.legacy_backup_dir) else []
+        if not mains and not backups: return
+        imported = []
+        for name in mains:
+            path = os.path.join(self.series_dir, name)
+            try:
+                with open(path, 'rb') as f: blob = f.read()
+            except FileNotFoundError: continue  # 다른 워커가 먼저 가져감
+            self.conn.execute("INSERT OR IGNORE INTO profiles VALUES (?, ?)", (name[:-len('.pkl')], blob)); imported.append(path)
+        for name in backups:
+            s_id_safe, _, day = name[:-len('.pkl')].rpartition('_')
+            if not (name.endswith('.pkl') and s_id_safe and len(day) == 8 and day.isdigit()): continue
+            path = os.path.join(self.legacy_backup_dir, name)
+            try:
+                with open(path, 'rb') as f: blob = f.read()
+            except FileNotFoundError: continue
+            self.conn.execute("INSERT OR IGNORE INTO history VALUES (?, ?, ?)", (s_id_safe, day, blob)); imported.append(path)
+        self.conn.commit()
+        for path in imported:
+            try: os.remove(path)
+            except FileNotFoundError: pass
+        try: os.rmdir(self.legacy_backup_dir)
+        except OSError: pass
+
+    @staticmethod
+    def _loads(rows):
+        profiles = {}; total = 0
+        for s_id, blob in rows: profiles[s_id] = pickle.loads(blob); total += len(blob)
+        metrics.inc('analysis_storage_bytes_read_total', total, store='profiles'); metrics.scanned(len(profiles))
+        return profiles
+
+    @staticmethod
+    def _dumps(profile):
+        blob = pickle.dumps(profile); metrics.inc('analysis_storage_bytes_written_total', len(blob), store='profiles')
+        return blob
+
+    def mains(self):
+        # 시리즈 전체 학생의 현재 프로필을 한 번에 읽음
+        return self._loads(self.conn.execute("SELECT student_id, profile FROM profiles"))
+
+    def history_on(self, day):
+        return self._loads(self.conn.execute("SELECT student_id, profile FROM history WHERE day = ?", (day,)))
+
+    def set_main(self, student_id, profile):
+        self.conn.execute("INSERT OR REPLACE INTO profiles VALUES (?, ?)", (safe_student_id(student_id), self._dumps(profile)))
+
+    def set_history(self, student_id, day, profile):
+        self.conn.execute("INSERT OR REPLACE INTO history VALUES (?, ?, ?)", (safe_student_id(student_id), day, self._dumps(profile)))
+
+    def restore_before(self, student_id, day):
+        # day 이전 가장 최근 기록으로 현재 프로필을 되돌리고, 나머지 기록은 삭제 (없으면 프로필 자체를 삭제)
+        s_id = safe_student_id(student_id)
+        row = self.conn.execute("SELECT day, profile FROM history WHERE student_id = ? AND day < ? ORDER BY day DESC LIMIT 1", (s_id, day)).fetchone()
+        if row:
+            self.conn.execute("INSERT OR REPLACE INTO profiles VALUES (?, ?)", (s_id, row[1]))
+            self.conn.execute("DELETE FROM history WHERE student_id = ? AND day != ?", (s_id, row[0]))
+        else:
+            self.conn.execute("DELETE FROM profiles WHERE student_id = ?", (s_id,))
+            self.conn.execute("DELETE FROM history WHERE student_id = ?", (s_id,))
+        return row is not None
+
+    def students(self):
+        return [row[0] for row in self.conn.execute("SELECT student_id FROM profiles UNION SELECT student_id FROM history")]
+
+    def delete_student(self, student_id):
+        s_id = safe_student_id(student_id)
+        deleted = self.conn.execute("DELETE FROM profiles WHERE student_id = ?", (s_id,)).rowcount
+        deleted += self.conn.execute("DELETE FROM history WHERE student_id = ?", (s_id,)).rowcount
+        return deleted > 0
+
+# --- 학생 목록 색인 ---
+STUDENT_REGISTRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (student_id TEXT NOT NULL, subject TEXT NOT NULL, course_series TEXT NOT NULL, has_submissions INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (student_id, subject, course_series)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+class StudentRegistry:
+    """student_id -> (과목, 수업 시리즈) 색인. 프로필 위치는 get_series_paths(과목, 수업 시리즈)의 profiles.db.
+    제출과 프로필 저장 때 등록되고, 학생 목록·접두어 검색·삭제는 이 색인만 조회한다. has_submissions는 그 수업 시리즈에
+    제출 기록이 있는지 여부로, 프로필을 삭제해도 제출 기록이 있는 행은 목록에 남긴다(rebuild() 결과와 같음).
+    색인이 비어 있으면(처음 실행, 복원 직후) 제출 기록과 프로필 저장소를 한 번 훑어 다시 만든다."""
+    def __init__(self, path):
+        self.path = path; self._lock = threading.Lock(); self._conn = None; self._pid = None
+        self._known = set(); self._known_generation = None  # 이미 등록된 항목 (삭제가 일어나면 generation이 바뀌어 비움)
+
+    @contextmanager
+    def _connect(self):
+        with self._lock:
+            if self._pid != os.getpid():  # fork 이후에는 연결을 새로 만듦
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+                self._conn.executescript(STUDENT_REGISTRY_SCHEMA); self._pid = os.getpid(); self._known = set()
+                if 'has_submissions' not in [row[1] for row in self._conn.execute("PRAGMA table_info(students)")]:
+                    # has_submissions 열이 없던 예전 색인은 버리고 다시 만듦
+                    self._conn.executescript("DROP TABLE students; DELETE FROM meta WHERE key = 'built';" + STUDENT_REGISTRY_SCHEMA)
+            try:
+                self._ensure_built(self._conn); yield self._conn; self._conn.commit()
+            except BaseException:
+                self._conn.rollback(); raise
+
+    def _meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _bump_generation(self, conn):
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", ((self._meta(conn, 'generation') or 0) + 1,))
+
+    def _ensure_built(self, conn):
+        if self._meta(conn, 'built'): return
+        conn.execute("BEGIN IMMEDIATE")
+        if self._meta(conn, 'built'): return  # 다른 워커가 먼저 만듦
+        submitted = {(s_id, str(item['subject']), str(item.get('course_series', 'default'))) for item in submission_store.all() for s_id in [submission_student_id(item)] if s_id}
+        rows = set(submitted)
+        if os.path.isdir(STUDENT_DB_DIRECTORY):
+            for subject in os.listdir(STUDENT_DB_DIRECTORY):
+                if not os.path.isdir(os.path.join(STUDENT_DB_DIRECTORY, subject)): continue
+                for course_series in os.listdir(os.path.join(STUDENT_DB_DIRECTORY, subject)):
+                    if not SeriesProfileStore.has_data(os.path.join(STUDENT_DB_DIRECTORY, subject, course_series)): continue
+                    with SeriesProfileStore(subject, course_series) as store: rows.update((s_id, subject, course_series) for s_id in store.students())
+        conn.execute("DELETE FROM students")
+        conn.executemany("INSERT INTO students VALUES (?, ?, ?, ?)", [row + (int(row in submitted),) for row in rows])
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('built', 1)"); self._bump_generation(conn)
+
+    def register(self, entries, has_submissions=False):
+        # entries: [(student_id, subject, course_series)]. 제출에서 온 항목은 has_submissions=True. 이 워커가 이미 등록한 항목은 DB에 쓰지 않음
+        with self._connect() as conn:
+            generation = self._meta(conn, 'generation')
+            if generation != self._known_generation: self._known = set(); self._known_generation = generation
+            flag = int(has_submissions)
+            new_entries = [tuple(map(str, e)) + (flag,) for e in entries if tuple(map(str, e)) + (flag,) not in self._known]
+            if new_entries:
+                conn.executemany("INSERT INTO students VALUES (?, ?, ?, ?) ON CONFLICT (student_id, subject, course_series) "
+                                 "DO UPDATE SET has_submissions = 1 WHERE excluded.has_submissions = 1", new_entries)
+                self._known.update(new_entries)
+
+    def search(self, prefix='', limit=None):
+        # student_id 접두어 검색 (기본 키 범위 조회). prefix가 비어 있으면 전체 목록
+        sql = "SELECT DISTINCT student_id FROM students WHERE student_id >= ? AND student_id < ? ORDER BY student_id"
+        params = [prefix, prefix + '\U0010ffff']
+        if limit: sql += " LIMIT ?"; params.append(limit)
+        with self._connect() as conn: return [row[0] for row in conn.execute(sql, params)]
+
+    def locations(self, student_id):
+        with self._connect() as conn:
+            return conn.execute("SELECT subject, course_series FROM students WHERE student_id = ?", (student_id,)).fetchall()
+
+    def remove(self, student_id):
+        # 프로필만 있던 행을 지움. 제출 기록이 남아 있는 수업 시리즈는 rebuild()를 해도 다시 들어오므로 빼지 않음
+        with self._connect() as conn:
+            conn.execute("DELETE FROM students WHERE student_id = ? AND has_submissions = 0", (student_id,)); self._bump_generation(conn)
+
+    def rebuild(self):
+        with self._connect() as conn: conn.execute("DELETE FROM meta WHERE key = 'built'")
+        with self._connect(): pass
+
+student_registry = StudentRegistry(STUDENT_REGISTRY_DB)
+
+# --- 학생 데이터(프로필) 관리 API ---
+def load_initial_profiles(subject, course_series, student_ids):
+    # 같은 수업 시리즈의 학생들을 한 트랜잭션에서 처리: 오늘 기록과 현재 프로필을 각각 한 번의 조회로 읽음
+    today_str = datetime.now(KST).strftime('%Y%m%d')
+    profiles = {}
+    with SeriesProfileStore(subject, course_series) as store:
+        todays = store.history_on(today_str); mains = None
+        for student_id in student_ids:
+            profile = todays.get(safe_student_id(student_id))
+            if profile is None:
+                if mains is None: mains = store.mains()
+                profile = mains.get(safe_student_id(student_id), {comp: 50.0 for comp in COMPETENCIES})
+                store.set_history(student_id, today_str, profile); todays[safe_student_id(student_id)] = profile
+            profiles[student_id] = profile
+    student_registry.register([(student_id, subject, course_series) for student_id in student_ids])
+    return profiles
+
+def save_final_profiles(subject, course_series, final_profiles):
+    # final_profiles: {student_id: profile}
+    with SeriesProfileStore(subject, course_series) as store:
+        for student_id, final_profile in final_profiles.items(): store.set_main(student_id, final_profile)
+    student_registry.register([(student_id, subject, course_series) for student_id in final_profiles])
+
+def parse_profile_batch(required_keys):
+    # 일괄 요청 본문 {"students": [{...}, ...]} 검사. student_id, subject, course_series는 문자열이어야 함. 올바르지 않으면 None
+    students = (request.get_json(silent=True) or {}).get('students')
+    def valid(entry):
+        return (isinstance(entry, dict) and all(entry.get(k) is not None for k in required_keys)
+                and all(isinstance(entry[k], str) for k in ('student_id', 'subject', 'course_series') if k in required_keys))
+    if not isinstance(students, list) or not all(valid(e) for e in students): return None
+    return students
+
 @app.route('/api/student-profile/initial', methods=['POST'])
 def get_initial_student_profile():
     if not is_admin_apikey(): return jsonify({"error": "권한이 없습니다."}), 401
     data = request.json
     student_id = data.get('student_id'); subject = data.get('subject'); course_series = data.get('course_series')
-    series_dir, backup_dir, main_profile_path = get_student_paths(subject, course_series, student_id)
-    os.makedirs(backup_dir, exist_ok=True)
-    today_str = datetime.now(KST).strftime('%Y%m%d')
-    backup_path = os.path.join(backup_dir, f"{student_id.replace('/', '_')}_{today_str}.pkl")
-    profile = {comp: 50.0 for comp in ('통찰력', '계산력', '논리력', '융합력', '개념', '전략')}
-    if os.path.exists(backup_path):
-        with open(backup_path, 'rb') as f: profile = pickle.load(f)
-    else:
-        if os.path.exists(main_profile_path):
-            with open(main_profile_path, 'rb') as f: profile = pickle.load(f)
-        with open(backup_path, 'wb') as f: pickle.dump(profile, f)
+    profile = load_initial_profiles(subject, course_series, [student_id])[student_id]
     return jsonify({"profile": profile})
 
+@app.route('/api/student-profile/initial-batch', methods=['POST'])
+def get_initial_student_profiles_batch():
+    if not is_admin_apikey(): return jsonify({"error": "권한이 없습니다."}), 401
+    students = parse_profile_batch(('student_id', 'subject', 'course_series'))
+    if students is None: return jsonify({"error": "students 목록 형식이 올바르지 않습니다."}), 400
+    profiles_by_series = {series_key: load_initial_profiles(*series_key, [e['student_id'] for e in entries]) for series_key, entries in group_by_series(students).items()}
+    return jsonify({"profiles": [{**e, "profile": profiles_by_series[(e['subject'], e['course_series'])][e['student_id']]} for e in students]})
+
 @app.route('/api/student-profile/commit', methods=['POST'])
 def commit_student_profile():
     if not is_admin_apikey(): return jsonify({"error": "권한이 없습니다."}), 401
     data = request.json
     student_id = data.get('student_id'); subject = data.get('subject'); course_series = data.get('course_series'); final_profile = data.get('final_profile')
-    _, _, main_profile_path = get_student_paths(subject, course_series, student_id)
-    with open(main_profile_path, 'wb') as f: pickle.dump(final_profile, f)
+    save_final_profiles(subject, course_series, {student_id: final_profile})
     return jsonify({"message": f"'{student_id}' 학생({subject}/{course_series})의 프로필이 성공적으로 저장되었습니다."})
 
+@app.route('/api/student-profile/commit-batch', methods=['POST'])
+def commit_student_profiles_batch():
+    if not is_admin_apikey(): return jsonify({"error": "권한이 없습니다."}), 401
+    students = parse_profile_batch(('student_id', 'subject', 'course_series', 'final_profile'))
+    if students is None: return jsonify({"error": "students 목록 형식이 올바르지 않습니다."}), 400
+    for (subject, course_series), entries in group_by_series(students).items():
+        save_final_profiles(subject, course_series, {e['student_id']: e['final_profile'] for e in entries})
+    return jsonify({"message": f"{len(students)}명 학생의 프로필이 성공적으로 저장되었습니다."})
+
 @app.route('/api/student-data', methods=['DELETE'])
 def delete_student_data():
     if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
     student_id = request.json.get('student_id')
     if not student_id or not re.match(r"(.+?)\((\d{4})\)_(.+)", student_id):
         return jsonify({"error": "잘못된 학생 ID 형식입니다."}), 400
-    s_name, s_phone, s_subj = re.match(r"(.+?)\((\d{4})\)_(.+)", student_id).groups()
-    subject_dir = os.path.join(STUDENT_DB_DIRECTORY, s_subj)
     deleted_count = 0
-    if os.path.exists(subject_dir):
-        for series_dir_name in os.listdir(subject_dir):
-            series_dir_path = os.path.join(subject_dir, series_dir_name)
-            if not os.path.isdir(series_dir_path): continue
-            student_profile_path_to_check = os.path.join(series_dir_path, f"{student_id.replace('/', '_')}.pkl")
-            if os.path.exists(student_profile_path_to_check):
-                shutil.rmtree(series_dir_path)
-                deleted_count += 1
+    for subject, course_series in student_registry.locations(student_id):
+        if not SeriesProfileStore.has_data(get_series_paths(subject, course_series)[0]): continue
+        with SeriesProfileStore(subject, course_series) as store:
+            if store.delete_student(student_id): deleted_count += 1
     if deleted_count > 0:
+        student_registry.remove(student_id)
         return jsonify({"message": f"'{student_id}' 학생의 모든 수업 시리즈 데이터({deleted_count}개)가 영구적으로 삭제되었습니다."})
     else:
         return jsonify({"error": f"'{student_id}' 학생의 데이터를 찾을 수 없습니다."}), 404
 
 # --- 재계산 API ---
+def recalculate_students(targets, start_date):
+    # targets: {(student_id, subject, course_series)}. 프로필은 수업 시리즈마다 한 트랜잭션으로 start_date 이전 기록으로 되돌리고,
+    # start_date 이후 제출은 한 번의 저널 기록으로 모두 대기 상태로 바꿈. 재설정된 기록 수를 돌려줌
+    day = start_date.strftime('%Y%m%d')
+    for (subject, course_series), entries in group_by_series({'student_id': t[0], 'subject': t[1], 'course_series': t[2]} for t in targets).items():
+        with SeriesProfileStore(subject, course_series) as store:
+            for entry in entries: store.restore_before(entry['student_id'], day)
+    with submission_store.transaction():
+        reset_items = []
+        for item in submission_store.since_date(start_date.isoformat()):
+            if (submission_student_id(item), item.get('subject'), item.get('course_series')) in targets:
+                reset_item = {**item, 'status': 'pending'}; reset_item.pop('processed_at', None); reset_items.append(reset_item)
+        submission_store.put_many(reset_items)
+    if reset_items: pending_notifier.notify()
+    return len(reset_items)
+
 @app.route('/api/recalculate-from-date', methods=['POST'])
 def recalculate_from_date():
     if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
@@ -268,9 +974,8 @@ def recalculate_from_date():
     student_id = data.get('student_id'); start_date_str = data.get('start_date'); target_submission_id = data.get('submission_id')
     target_submission = None
     try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data_for_find = json.load(f)
-        target_submission = next((item for item in db_data_for_find if item['id'] == target_submission_id), None)
-    except:
+        target_submission = submission_store.get(target_submission_id)
+    except TypeError:
         return jsonify({"error": "제출 기록을 찾는 데 실패했습니다."}), 404
     if not target_submission or 'course_series' not in target_submission:
         return jsonify({"error": "재계산에 필요한 수업 시리즈 정보를 찾을 수 없습니다."}), 400
@@ -278,50 +983,42 @@ def recalculate_from_date():
     s_name, s_phone, s_subj = (re.match(r"(.+?)\((\d{4})\)_(.+)", student_id) or (None, None, None)).groups()
     if not all([s_name, s_phone, s_subj]): return jsonify({"error": "잘못된 학생 ID 형식입니다."}), 400
     start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-    _, backup_dir, main_profile_path = get_student_paths(s_subj, course_series, student_id)
-    s_id_safe = student_id.replace('/', '_')
-    backups = sorted(glob.glob(os.path.join(backup_dir, f"{s_id_safe}_*.pkl")), reverse=True)
-    profile_to_restore = None; backup_to_keep = None
-    for backup_file in backups:
-        try:
-            date_part = os.path.basename(backup_file).replace(f"{s_id_safe}_", "").replace(".pkl", "")
-            if datetime.strptime(date_part, '%Y%m%d').date() < start_date:
-                with open(backup_file, 'rb') as f: profile_to_restore = pickle.load(f)
-                backup_to_keep = backup_file; break
-        except (ValueError, IndexError): continue
-    if profile_to_restore:
-        with open(main_profile_path, 'wb') as f: pickle.dump(profile_to_restore, f)
-    elif os.path.exists(main_profile_path): os.remove(main_profile_path)
-    for backup_file in backups:
-        if backup_file != backup_to_keep: os.remove(backup_file)
-    try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data = json.load(f)
-    except: db_data = []
-    reprocess_count = 0
-    for item in db_data:
-        if (item.get('student_name') == s_name and item.get('phone_suffix') == s_phone and item.get('subject') == s_subj and item.get('course_series') == course_series):
-            try:
-                if datetime.fromisoformat(item.get('submitted_at')).astimezone(KST).date() >= start_date:
-                    item['status'] = 'pending'; item.pop('processed_at', None); reprocess_count += 1
-            except: continue
-    with open(DB_FILE, 'w', encoding='utf-8') as f: json.dump(db_data, f, ensure_ascii=False, indent=2)
+    reprocess_count = recalculate_students({(student_id, s_subj, course_series)}, start_date)
     return jsonify({"message": f"'{student_id}' 학생의 '{course_series}' 수업 시리즈 데이터가 {start_date_str}부터 재처리 대기 상태로 변경되었습니다. 총 {reprocess_count}개 기록이 재설정되었습니다."})
 
+@app.route('/api/recalculate-bulk', methods=['POST'])
+def recalculate_bulk():
+    if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
+    # 요청 본문: start_date(필수) + form_id / course_series(+subject) / student_ids 중 하나 이상 (여러 개면 모두 만족하는 제출만).
+    # start_date 이후에 조건에 맞는 제출이 있는 (학생, 수업 시리즈) 전체를 재계산
+    data = request.get_json(silent=True) or {}
+    try: start_date = datetime.strptime(data.get('start_date') or '', '%Y-%m-%d').date()
+    except (ValueError, TypeError): return jsonify({"error": "start_date 형식이 올바르지 않습니다."}), 400
+    form_id, course_series, subject, student_ids = data.get('form_id'), data.get('course_series'), data.get('subject'), data.get('student_ids')
+    if student_ids is not None and not (isinstance(student_ids, list) and all(isinstance(s, str) for s in student_ids)):
+        return jsonify({"error": "student_ids 목록 형식이 올바르지 않습니다."}), 400
+    if form_id is None and not course_series and not student_ids:
+        return jsonify({"error": "form_id, course_series, student_ids 중 하나가 필요합니다."}), 400
+    wanted_students = set(student_ids or [])
+    def matches(item):
+        return ((form_id is None or item.get('form_id') == form_id) and (not course_series or item.get('course_series') == course_series)
+                and (not subject or item.get('subject') == subject) and (not wanted_students or submission_student_id(item) in wanted_students))
+    targets = {(submission_student_id(item), item['subject'], item['course_series']) for item in submission_store.since_date(start_date.isoformat())
+               if matches(item) and submission_student_id(item) and item.get('course_series')}
+    if not targets: return jsonify({"error": "조건에 맞는 재계산 대상 제출 기록이 없습니다."}), 404
+    reprocess_count = recalculate_students(targets, start_date)
+    return jsonify({"message": f"{len({t[0] for t in targets})}명 학생({len({t[1:] for t in targets})}개 수업 시리즈)의 데이터가 {start_date.isoformat()}부터 재처리 대기 상태로 변경되었습니다. 총 {reprocess_count}개 기록이 재설정되었습니다."})
+
 # --- 데이터 조회 및 기타 관리 API ---
 @app.route('/api/calendar/events', methods=['GET'])
 def get_calendar_events():
     if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
     start_str, end_str = request.args.get('start'), request.args.get('end'); events_to_show = defaultdict(set)
     try:
-        with open(FORMS_DB_FILE, 'r', encoding='utf-8') as f: 
-            forms_info = {form['id']: f"{form.get('name')} ({form.get('startDate')})" for form in json.load(f)}
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data = json.load(f)
-        for item in db_data:
-            try:
-                item_date_str = datetime.fromisoformat(item.get('submitted_at')).astimezone(KST).strftime('%Y-%m-%d')
-                if start_str <= item_date_str < end_str:
-                    if item.get('form_id') in forms_info: events_to_show[item_date_str].add(item.get('form_id'))
-            except: continue
+        forms_info = {form['id']: f"{form.get('name')} ({form.get('startDate')})" for form in forms_catalog.all()}
+        for item_date_str, form_ids in submission_store.forms_by_date(start_str, end_str):
+            for f_id in form_ids:
+                if f_id in forms_info: events_to_show[item_date_str].add(f_id)
     except: pass
     calendar_events = [{"title": forms_info.get(f_id, "알 수 없는 수업"), "start": d_str, "extendedProps": {"formId": f_id}} for d_str, f_ids in events_to_show.items() for f_id in f_ids]
     return jsonify(calendar_events)
@@ -331,60 +1028,218 @@ def get_data_by_date_and_form(date_str, form_id):
     if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
     latest_submissions = {}
     try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data = json.load(f)
-        for item in db_data:
-            try:
-                if datetime.fromisoformat(item.get('submitted_at')).astimezone(KST).strftime('%Y-%m-%d') == date_str and item.get('form_id') == form_id:
-                    s_key = (item.get('student_name'), item.get('phone_suffix'))
-                    if s_key not in latest_submissions or item.get('submitted_at') > latest_submissions[s_key].get('submitted_at'):
-                        item['student_id'] = f"{item.get('student_name')}({item.get('phone_suffix')})_{item.get('subject')}"
-                        latest_submissions[s_key] = item
-            except: continue
+        for item in submission_store.on_date_form(date_str, form_id):
+            s_key = (item.get('student_name'), item.get('phone_suffix'))
+            if s_key not in latest_submissions or item.get('submitted_at') > latest_submissions[s_key].get('submitted_at'):
+                latest_submissions[s_key] = {**item, 'student_id': f"{item.get('student_name')}({item.get('phone_suffix')})_{item.get('subject')}"}
     except: pass
     return jsonify(list(latest_submissions.values()))
 
 @app.route('/api/submission/<int:submission_id>', methods=['GET'])
 def get_submission(submission_id):
     if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
-    try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data = json.load(f)
-        submission = next((item for item in db_data if item.get('id') == submission_id), None)
-        if submission: return jsonify(submission)
-        return jsonify({"error": "데이터를 찾을 수 없습니다."}), 404
-    except (FileNotFoundError, json.JSONDecodeError):
-        return jsonify({"error": "데이터 파일을 찾을 수 없습니다."}), 500
+    submission = submission_store.get(submission_id)
+    if submission: return jsonify(submission)
+    return jsonify({"error": "데이터를 찾을 수 없습니다."}), 404
 
 @app.route('/api/students', methods=['GET'])
 def get_all_students():
     if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
-    students = set()
+    # ?prefix=김 &limit=20 : 자동 완성용 접두어 검색
+    return jsonify(student_registry.search(request.args.get('prefix', ''), request.args.get('limit', type=int)))
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    if not (is_admin_session() or is_admin_apikey()): return jsonify({"error": "권한이 없습니다."}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# --- 백업 ZIP 스트리밍 ---
+class ZipStreamBuffer(io.RawIOBase):
+    """zipfile이 쓰는 바이트를 모아 두었다가 drain()으로 꺼내 가는 비탐색(non-seekable) 출력 버퍼"""
+    def __init__(self): self._chunks = []; self.bytes_written = 0
+    def writable(self): return True
+    def write(self, b): self._chunks.append(bytes(b)); self.bytes_written += len(b); return len(b)
+    def drain(self): data = b''.join(self._chunks); self._chunks.clear(); return data
+
+def open_profile_db_snapshot(path):
+    # 사용 중일 수 있는 profiles.db를 sqlite3 백업 API로 임시 파일에 복사해 연 파일을 돌려줌 (읽기 트랜잭션 안에서 복사되므로
+    # 쓰는 도중의 상태가 백업되지 않음). 증분 백업 비교를 위해 복사본에 원본의 수정 시각을 붙임. 임시 파일은 연 뒤 바로 삭제
+    st = os.stat(path)
+    fd, tmp_path = tempfile.mkstemp(suffix='.db'); os.close(fd)
     try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f: db_data = json.load(f)
-        for item in db_data:
-            if all(k in item for k in ['student_name', 'phone_suffix', 'subject']):
-                students.add(f"{item['student_name']}({item['phone_suffix']})_{item['subject']}")
-    except: pass
-    return jsonify(sorted(list(students)))
+        # 수업 시리즈·과목 이름에 #, %, ? 가 들어갈 수 있으므로 경로는 퍼센트 인코딩한 URI로 넘김
+        src = sqlite3.connect(pathlib.Path(path).as_uri() + "?mode=ro", uri=True, timeout=30)
+        dest = sqlite3.connect(tmp_path)
+        try: src.backup(dest)
+        finally: dest.close(); src.close()
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        return open(tmp_path, 'rb')
+    finally: os.remove(tmp_path)
+
+def restore_profile_db(src_path, path):
+    # 이미 있는 profiles.db는 파일을 바꿔치지 않고 sqlite3 백업 API로 내용을 덮어씀. 대상 DB의 잠금을 잡고 같은 파일에 쓰므로
+    # 쓰기 도중이던 다른 워커의 연결이 예전 파일에 기록해 내용이 사라지는 일이 없음
+    src = sqlite3.connect(src_path); dest = sqlite3.connect(path, timeout=30)
+    try: src.backup(dest)
+    finally: dest.close(); src.close(); os.remove(src_path)
+
+def iter_backup_entries(skip=None):
+    # (ZIP 내부 경로, 열린 파일) 목록. skip(ZIP 내부 경로, os.stat 결과)이 참인 파일은 열지 않고 건너뜀
+    for path, f in submission_store.open_files() + [(FORMS_DB_FILE, None)]:
+        try:
+            if f is None: f = open(path, 'rb')
+        except FileNotFoundError: continue
+        if skip and skip(os.path.basename(path), os.fstat(f.fileno())): f.close(); continue
+        yield os.path.basename(path), f
+    for root, _, files in os.walk(STUDENT_DB_DIRECTORY):
+        for file in files:
+            if file.endswith('-journal'): continue  # SQLite 트랜잭션 임시 파일 (profiles.db는 일관된 복사본으로 백업하므로 필요 없음)
+            file_path = os.path.join(root, file); archive_name = os.path.relpath(file_path, DATA_DIR)
+            try:
+                if skip and skip(archive_name, os.stat(file_path)): continue
+                f = open_profile_db_snapshot(file_path) if file == PROFILE_DB_NAME else open(file_path, 'rb')
+            except FileNotFoundError: continue  # 순회 도중 삭제된 학생 데이터
+            yield archive_name, f
+
+class HashingReader:
+    """읽어 가는 내용으로 sha256을 계산하는 파일 래퍼. ZIP으로 스트리밍하면서 한 번의 읽기로 manifest 해시를 얻기 위함"""
+    def __init__(self, f): self._f = f; self._hash = hashlib.sha256(); self.bytes_read = 0
+    def read(self, n=-1):
+        data = self._f.read(n); self._hash.update(data); self.bytes_read += len(data); return data
+    def fileno(self): return self._f.fileno()
+    def close(self): self._f.close()
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+    def hexdigest(self): return self._hash.hexdigest()
+
+def file_digest(f):
+    h = hashlib.sha256()
+    for chunk in iter(lambda: f.read(BACKUP_CHUNK_SIZE), b''): h.update(chunk)
+    return h.hexdigest()
+
+def iter_manifest_entries(base_manifest=None):
+    # 이전 manifest와 크기·수정 시각이 같은 파일은 읽지 않고 건너뛰고, 나머지만 내보냄 (base_manifest가 없으면 전체).
+    # 마지막 항목으로 현재 전체 파일 목록과 삭제된 파일 목록을 담은 manifest를 내보냄
+    base_files = (base_manifest or {}).get('files', {}); files = {}
+    def unchanged(archive_name, st):
+        base = base_files.get(archive_name)
+        if base and base.get('size') == st.st_size and base.get('mtime_ns') == st.st_mtime_ns: files[archive_name] = base; return True
+        return False
+    for archive_name, f in iter_backup_entries(unchanged):
+        st = os.fstat(f.fileno()); reader = HashingReader(f)
+        yield archive_name, reader
+        files[archive_name] = {'size': reader.bytes_read, 'mtime_ns': st.st_mtime_ns, 'sha256': reader.hexdigest()}
+    manifest = {"created_at": datetime.now(KST).isoformat(), "base_created_at": (base_manifest or {}).get('created_at'),
+                "files": files, "deleted": sorted(set(base_files) - set(files))}
+    yield BACKUP_MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+
+def backup_target_path(archive_name):
+    # 복원 시 ZIP 내부 경로를 DATA_DIR 안의 실제 경로로 바꿈. 백업 대상 밖을 가리키면 None
+    path = os.path.normpath(os.path.join(DATA_DIR, archive_name))
+    if path in (DB_FILE, DB_JOURNAL_FILE, FORMS_DB_FILE) or path.startswith(STUDENT_DB_DIRECTORY + os.sep): return path
+    return None
+
+def stream_zip(entries, compress=True):
+    # 전체 ZIP을 메모리에 만들지 않고, 파일을 읽는 대로 BACKUP_CHUNK_SIZE 단위로 압축 결과를 내보냄.
+    # 응답 본문은 요청 처리(teardown_request)가 끝난 뒤에 만들어지므로, ZIP 생성 시간과 바이트 수는 생성기가 끝날 때 기록
+    buf = ZipStreamBuffer(); started = time.perf_counter()
+    try:
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for archive_name, f in entries:
+                if isinstance(f, bytes):
+                    zf.writestr(archive_name, f); yield buf.drain(); continue
+                with f:
+                    st = os.fstat(f.fileno())
+                    zinfo = zipfile.ZipInfo(archive_name, datetime.fromtimestamp(st.st_mtime).timetuple()[:6])
+                    zinfo.file_size = st.st_size; zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+                    with zf.open(zinfo, 'w') as dest:
+                        while True:
+                            chunk = f.read(BACKUP_CHUNK_SIZE)
+                            if not chunk: break
+                            dest.write(chunk); metrics.inc('analysis_storage_bytes_read_total', len(chunk), store='backup')
+                            data = buf.drain()
+                            if data: yield data
+                data = buf.drain()
+                if data: yield data
+        yield buf.drain()
+    finally:
+        metrics.inc('analysis_storage_bytes_written_total', buf.bytes_written, store='backup')
+        metrics.observe('analysis_backup_duration_seconds', time.perf_counter() - started, buckets=BACKUP_DURATION_BUCKETS, compress=str(compress).lower())
+        try: metrics.flush(force=True)
+        except OSError: pass
 
 @app.route('/api/backup/download', methods=['GET'])
 def download_full_backup():
     if not is_admin_session(): return "권한이 없습니다.", 401
-    memory_file = io.BytesIO()
-    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-        paths_to_backup = [DB_FILE, FORMS_DB_FILE, STUDENT_DB_DIRECTORY]
-        for path in paths_to_backup:
-            if not os.path.exists(path): continue
-            if os.path.isfile(path):
-                zf.write(path, os.path.basename(path))
-            elif os.path.isdir(path):
-                for root, _, files in os.walk(path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        archive_name = os.path.relpath(file_path, DATA_DIR)
-                        zf.write(file_path, archive_name)
-    memory_file.seek(0)
+    # ?since=2024-03-01T00:00 : 그 이후 수정된 파일만, ?compress=false : 압축 없이 저장(CPU 절약)
+    modified_since = None
+    if request.args.get('since'):
+        try:
+            since_dt = datetime.fromisoformat(request.args['since'])
+            modified_since = (since_dt if since_dt.tzinfo else KST.localize(since_dt)).timestamp()
+        except ValueError: return jsonify({"error": "since 형식이 올바르지 않습니다."}), 400
+    compress = request.args.get('compress', 'true').lower() != 'false'
+    # 수정 시각으로 거른 부분 백업에는 manifest를 넣지 않음 (증분 백업 체인의 기준은 전체 백업)
+    entries = iter_backup_entries(lambda name, st: st.st_mtime <= modified_since) if modified_since is not None else iter_manifest_entries()
     backup_filename = f"backup_{datetime.now(KST).strftime('%Y-%m-%d_%H%M')}.zip"
-    return send_file(memory_file, mimetype='application/zip', as_attachment=True, download_name=backup_filename)
+    return Response(stream_zip(entries, compress), mimetype='application/zip',
+                    headers={"Content-Disposition": f"attachment; filename={backup_filename}"})
+
+@app.route('/api/backup/incremental', methods=['POST'])
+def download_incremental_backup():
+    if not is_admin_session(): return "권한이 없습니다.", 401
+    # 요청 본문: 직전 백업 ZIP의 backup_manifest.json 내용. 그 이후 바뀐 파일과 새 manifest만 내려받음
+    base_manifest = request.get_json(silent=True)
+    if not isinstance(base_manifest, dict) or not isinstance(base_manifest.get('files'), dict):
+        return jsonify({"error": "직전 백업의 manifest가 필요합니다."}), 400
+    backup_filename = f"backup_incremental_{datetime.now(KST).strftime('%Y-%m-%d_%H%M')}.zip"
+    return Response(stream_zip(iter_manifest_entries(base_manifest)), mimetype='application/zip',
+                    headers={"Content-Disposition": f"attachment; filename={backup_filename}"})
+
+@app.route('/api/backup/restore', methods=['POST'])
+def restore_backup():
+    if not is_admin_session(): return jsonify({"error": "권한이 없습니다."}), 401
+    # archives: 전체 백업 ZIP 다음에 증분 백업 ZIP들을 만든 순서대로 첨부
+    try: archives = [zipfile.ZipFile(f.stream) for f in request.files.getlist('archives')]
+    except zipfile.BadZipFile: return jsonify({"error": "ZIP 파일이 올바르지 않습니다."}), 400
+    if not archives: return jsonify({"error": "복원할 백업 파일이 필요합니다."}), 400
+    manifests = [json.loads(zf.read(BACKUP_MANIFEST_NAME)) if BACKUP_MANIFEST_NAME in zf.namelist() else None for zf in archives]
+    if manifests[0] and manifests[0].get('base_created_at'):
+        return jsonify({"error": "첫 번째 백업은 전체 백업이어야 합니다."}), 400
+    for prev, cur in zip(manifests, manifests[1:]):
+        if cur and cur.get('base_created_at') and (not prev or prev.get('created_at') != cur['base_created_at']):
+            return jsonify({"error": "증분 백업의 순서가 맞지 않습니다."}), 400
+    for zf, manifest in zip(archives, manifests):
+        expected_files = (manifest or {}).get('files', {})
+        for name in zf.namelist():
+            if name == BACKUP_MANIFEST_NAME: continue
+            if not backup_target_path(name): return jsonify({"error": f"백업 대상이 아닌 경로가 포함되어 있습니다: {name}"}), 400
+            expected = expected_files.get(name, {}).get('sha256')
+            with zf.open(name) as src:
+                if expected and file_digest(src) != expected: return jsonify({"error": f"손상된 백업 파일입니다: {name}"}), 400
+    restored_count = 0; removed_count = 0
+    with submission_store.transaction(), file_lock(FORMS_LOCK_FILE):
+        for zf, manifest in zip(archives, manifests):
+            for name in zf.namelist():
+                if name == BACKUP_MANIFEST_NAME: continue
+                path = backup_target_path(name); os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp{os.getpid()}"
+                with zf.open(name) as src, open(tmp_path, 'wb') as dest: shutil.copyfileobj(src, dest, BACKUP_CHUNK_SIZE)
+                if os.path.basename(path) == PROFILE_DB_NAME and os.path.exists(path): restore_profile_db(tmp_path, path)
+                else: os.replace(tmp_path, path)
+                # manifest의 수정 시각을 되살려, 복원 뒤 첫 증분 백업이 모든 파일을 바뀐 것으로 보지 않게 함
+                mtime_ns = (manifest or {}).get('files', {}).get(name, {}).get('mtime_ns')
+                if isinstance(mtime_ns, int): os.utime(path, ns=(mtime_ns, mtime_ns))
+                restored_count += 1
+        # 마지막 manifest에 없는 파일은 그 시점에 존재하지 않던 파일이므로 삭제
+        if manifests[-1]:
+            keep = set(manifests[-1].get('files', {}))
+            current = [os.path.join(root, file) for root, _, files in os.walk(STUDENT_DB_DIRECTORY) for file in files if not file.endswith('-journal')]
+            for path in [DB_FILE, DB_JOURNAL_FILE, FORMS_DB_FILE] + current:
+                if os.path.exists(path) and os.path.relpath(path, DATA_DIR) not in keep: os.remove(path); removed_count += 1
+    student_registry.rebuild()
+    return jsonify({"message": f"백업 {len(archives)}개를 복원했습니다. {restored_count}개 파일 복원, {removed_count}개 파일 삭제."})
 
 if __name__ == '__main__':
     init_all_dbs()
@@ -0,0 +1,74 @@
+"""여러 gunicorn 워커에 동시에 /submit 을 보내는 스트레스 테스트.
+
+서버를 멈춘 뒤 디스크의 제출 기록(submissions.json + submissions.jsonl)을 새로 읽어 다음을 확인한다.
+- 같은 날 같은 (학생, 수업) 제출은 하나의 id로 합쳐지고, 다른 제출끼리는 id가 겹치지 않음
+- 응답으로 받은 id가 모두 디스크에 있고, 그 기록의 학생·수업이 요청과 같음
+- 기록 수가 서로 다른 (학생, 수업) 수와 같음 (잃어버리거나 중복 저장된 기록 없음)
+
+    python stress_submit.py --workers 4 --concurrency 32 --requests 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="동시 /submit 스트레스 테스트")
+    parser.add_argument('--data-dir', help="데이터 디렉토리 (기본: 새 임시 디렉토리)")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn 워커 수")
+    parser.add_argument('--concurrency', type=int, default=16, help="동시 요청 수")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--forms', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    data_dir = os.path.abspath(args.data_dir or tempfile.mkdtemp(prefix='analysis-stress-'))
+    os.environ['DATA_DIR'] = data_dir; os.environ.setdefault('API_KEY', 'stress-api-key')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import server
+    from benchmark import HttpClient, start_gunicorn
+    server.init_all_dbs()
+    rng = random.Random(args.seed)
+    bodies = [{"form_id": f"form_{rng.randrange(args.forms)}", "student_name": f"학생{n:05d}", "phone_suffix": f"{n % 10000:04d}", "subject": "수학"}
+              for n in (rng.randrange(args.students) for _ in range(args.requests))]
+    proc, base_url = start_gunicorn(args.workers, data_dir)
+    try:
+        local = threading.local()
+        def submit(body):
+            if not hasattr(local, 'client'): local.client = HttpClient(base_url, os.environ['API_KEY'])
+            status, _, response_body = local.client.request('POST', '/submit', body)
+            return body, status, response_body
+        with ThreadPoolExecutor(args.concurrency) as pool: results = list(pool.map(submit, bodies))
+    finally:
+        proc.terminate(); proc.wait()
+    failures = []
+    ids_by_key = defaultdict(set); keys_by_id = defaultdict(set)
+    for body, status, response_body in results:
+        if status != 201: failures.append(f"응답 {status}: {body}"); continue
+        key = (body["student_name"], body["phone_suffix"], body["form_id"])
+        ids_by_key[key].add(response_body["id"]); keys_by_id[response_body["id"]].add(key)
+    failures += [f"같은 제출에 여러 id: {key} -> {sorted(ids)}" for key, ids in ids_by_key.items() if len(ids) > 1]
+    failures += [f"여러 제출이 같은 id: {s_id} -> {sorted(keys)}" for s_id, keys in keys_by_id.items() if len(keys) > 1]
+    # 워커들이 남긴 파일을 새 저장소 객체로 처음부터 다시 읽어 확인
+    stored = server.SubmissionStore(server.DB_FILE, server.DB_JOURNAL_FILE, server.SUBMISSIONS_LOCK_FILE).all()
+    stored_by_id = {item['id']: item for item in stored}
+    if len(stored_by_id) != len(stored): failures.append(f"디스크에 id가 중복된 기록이 있습니다: {len(stored)}건 중 {len(stored_by_id)}개 id")
+    if len(stored) != len(ids_by_key): failures.append(f"기록 수 {len(stored)}건이 서로 다른 제출 수 {len(ids_by_key)}건과 다릅니다.")
+    for s_id, keys in keys_by_id.items():
+        item = stored_by_id.get(s_id)
+        if item is None: failures.append(f"디스크에 없는 id: {s_id}")
+        elif (item['student_name'], item['phone_suffix'], item['form_id']) not in keys: failures.append(f"id {s_id}의 기록이 요청과 다릅니다: {item}")
+    print(f"데이터 디렉토리: {data_dir}")
+    print(f"요청 {len(results)}건, 서로 다른 제출 {len(ids_by_key)}건, 디스크 기록 {len(stored)}건, 문제 {len(failures)}건")
+    for failure in failures[:20]: print("  " + failure)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())